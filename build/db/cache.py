@@ -2,19 +2,26 @@ from db.permissions import Right
 
 
 class Cache:
-    
+    """
+    This is the class for the cache of permission checks that have succeeded. Entries are kept across
+    programs and are invalidated when the delegations for their record and right change.
+
+    Attributes:
+        data ({(string, Right): set(string)}): Map from a record and right to the principals that have the right
+    """
+
     def __init__(self):
         self.__data = {}
-    
-    def check(self, record_name, right):
-        if right in self.__data.get(record_name, dict()):
+
+    def check(self, principal, record_name, right):
+        if principal in self.__data.get((record_name, right), set()):
             return True
         return False
 
-    def update(self, record_name, right):
-        if record_name not in self.__data:
-            self.__data[record_name] = set()
-        self.__data[record_name].add(right)
+    def update(self, principal, record_name, right):
+        if (record_name, right) not in self.__data:
+            self.__data[(record_name, right)] = set()
+        self.__data[(record_name, right)].add(principal)
 
-    def reset(self, record_name, right):
-        self.__data.get(record_name, set()).discard(right)
+    def invalidate(self, record_name, right):
+        self.__data.pop((record_name, right), None)
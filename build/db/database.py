@@ -2,6 +2,8 @@ from db.store import Store, RecordKeyError
 from db.principal import Principal
 from db.permissions import Permissions, Right, ALL_RIGHTS
 from db.cache import Cache
+from db.journal import Journal
+from db.storage import Changes
 import copy
 
 
@@ -30,17 +32,20 @@ class Database:
         - global_store ({string: [] | {} | string}): Global store that persists across program executions.
           Map from the record name to the record itself.
         - permissions (Permissions): Data store that keeps track of all of the permissions assignments in the database.
+        - storage (Storage): On-disk storage that committed transactions are written to, if the database is persistent.
     """
 
-    def __init__(self, admin_password):
+    def __init__(self, admin_password, storage=None):
         """
         The constructor for the Database class.
 
         Paramaters:
             admin_password (string): The admin password passed when the database is initialized.
+            storage (Storage): On-disk storage to load the database from and write committed transactions to.
 
         - Initializes all of the values to have no data in them
         - Creates the admin user and inserts them into the set of principals
+        - Loads the database from storage if it has been stored before
         """
 
         self.__principals = {}
@@ -50,13 +55,12 @@ class Database:
         self.__global_store = Store()
         self.__permissions = Permissions()
         self.__cache = Cache()
+        self.__permissions.add_listener(self.__cache.invalidate)
 
-        # Backups of the elements
-        self.__backup_principals = copy.deepcopy(self.__principals)
-        self.__backup_default_delegator = copy.deepcopy(self.__default_delegator)
-        self.__backup_local_store = copy.deepcopy(self.__local_store)
-        self.__backup_global_store = copy.deepcopy(self.__global_store)
-        self.__backup_permissions = copy.deepcopy(self.__permissions)
+        # Journal of the changes made in the current transaction
+        self.__journal = None
+        self.__changes = Changes()
+        self.__storage = storage
 
         # Creates the admin
         p = Principal("admin", admin_password, admin=True)
@@ -64,6 +68,9 @@ class Database:
         p = Principal("anyone", "default", admin=False, accessible=False)
         self.__principals["anyone"] = p
 
+        if storage is not None:
+            self.__load()
+
     def get_principal(self, username):
         """
         The function to return a principal from the database.
@@ -106,11 +113,26 @@ class Database:
         self.get_current_principal()
 
     def create_backups(self):
-        self.__backup_principals = copy.deepcopy(self.__principals)
-        self.__backup_default_delegator = copy.deepcopy(self.__default_delegator)
-        self.__backup_local_store = copy.deepcopy(self.__local_store)
-        self.__backup_global_store = copy.deepcopy(self.__global_store)
-        self.__backup_permissions = copy.deepcopy(self.__permissions)
+        """
+        The function to start a new transaction on the database. Nothing is copied up front; the inverse
+        of each change to the global store, permissions and principals is recorded in a journal instead.
+        """
+        self.__journal = Journal()
+
+    def __restore_principal(self, username, principal):
+        """
+        The function to restore a principal to the state it had before it was modified
+        """
+        if principal is None:
+            self.__principals.pop(username, None)
+        else:
+            self.__principals[username] = principal
+
+    def __restore_default_delegator(self, username):
+        """
+        The function to restore the default delegator to the one set before it was modified
+        """
+        self.__default_delegator = username
 
     def create_principal(self, username, password):
         """
@@ -135,6 +157,9 @@ class Database:
         if not self.get_current_principal().is_admin():
             raise SecurityViolation("current principal is not admin user")
         p = Principal(username, password)
+        if self.__journal is not None:
+            self.__journal.record(self.__restore_principal, username, None)
+        self.__changes.principals.add(username)
         self.__principals[username] = p
         self.set_delegation("all", self.__default_delegator, username, ALL_RIGHTS)
 
@@ -178,6 +203,10 @@ class Database:
         if username != self.get_current_principal().get_username() and not self.get_current_principal().is_admin():
             raise SecurityViolation("cannot change password of another principal without admin privileges")
 
+        if self.__journal is not None and username in self.__principals:
+            self.__journal.record(self.__restore_principal, username, copy.copy(self.__principals[username]))
+        self.__changes.principals.add(username)
+
         if username == self.get_current_principal().get_username():
             self.get_current_principal().change_password(password)
             self.__principals[username] = self.get_current_principal()
@@ -197,12 +226,13 @@ class Database:
         """
         self.check_principal_set()
 
-        if self.__cache.check(record_name, right):
+        username = self.get_current_principal().get_username()
+        if self.__cache.check(username, record_name, right):
             return True
 
-        has_permission = self.__permissions.check_permission(record_name, self.get_current_principal().get_username(), right)
+        has_permission = self.__permissions.check_permission(record_name, username, right)
         if has_permission:
-            self.__cache.update(record_name, right)
+            self.__cache.update(username, record_name, right)
         return has_permission
 
     def delete_record(self, record_name):
@@ -211,7 +241,8 @@ class Database:
         if self.__local_store.read_record(record_name) is not None:
             self.__local_store.delete_record(record_name)
         elif self.__global_store.read_record(record_name) is not None:
-            self.__global_store.delete_record(record_name)
+            self.__changes.records.add(record_name)
+            self.__global_store.delete_record(record_name, journal=self.__journal)
 
     def set_record(self, record_name, value):
         """
@@ -234,12 +265,16 @@ class Database:
             self.__local_store.set_record(record_name, value)
         elif self.__global_store.read_record(record_name) is not None:
             if self.check_permission(record_name, Right.WRITE):
-                self.__global_store.set_record(record_name, value)
+                self.__changes.records.add(record_name)
+                self.__global_store.set_record(record_name, value, journal=self.__journal)
             else:
                 raise SecurityViolation("principal does not have write permission on record")
         else:
-            self.__global_store.set_record(record_name, value)
-            self.__permissions.add_permissions(record_name, "admin", self.get_current_principal().get_username(), ALL_RIGHTS)
+            self.__changes.records.add(record_name)
+            self.__changes.permissions.add((record_name, self.get_current_principal().get_username()))
+            self.__global_store.set_record(record_name, value, journal=self.__journal)
+            self.__permissions.add_permissions(record_name, "admin", self.get_current_principal().get_username(), ALL_RIGHTS,
+                                               journal=self.__journal)
 
     def append_record(self, record_name, value):
         """
@@ -263,7 +298,8 @@ class Database:
             self.__local_store.append_record(record_name, value)
         elif self.__global_store.read_record(record_name) is not None:
             if self.check_permission(record_name, Right.WRITE) or self.check_permission(record_name, Right.APPEND):
-                self.__global_store.append_record(record_name, value)
+                self.__changes.records.add(record_name)
+                self.__global_store.append_record(record_name, value, journal=self.__journal)
             else:
                 raise SecurityViolation("principal does not have write permission or append permission on record")
         else:
@@ -291,6 +327,21 @@ class Database:
         else:
             self.__local_store.set_record(record_name, value)
 
+    def record_exists(self, record_name):
+        """
+        The function to check whether a record name is already used in either the global store or the local store
+
+        Parameters:
+            record_name (string): The name of the record
+
+        Returns:
+            bool: Whether the record exists in the database
+        """
+
+        self.check_principal_set()
+
+        return self.__local_store.read_record(record_name) is not None or self.__global_store.read_record(record_name) is not None
+
     def return_record(self, raw_record_name):
         """
         The function to return a record either from the global store or the local store
@@ -363,14 +414,16 @@ class Database:
             for elem in from_rights:
                 # Checking whether the principal has delegate permission on object and element exists in global store
                 if self.__permissions.check_permission(elem, from_principal, Right.DELEGATE) and self.__global_store.read_record(elem) is not None:
-                    self.__permissions.add_permissions(elem, from_principal, to_principal, right)
+                    self.__changes.permissions.add((elem, to_principal))
+                    self.__permissions.add_permissions(elem, from_principal, to_principal, right, journal=self.__journal)
         else:
             # Checking whether if the current user is not an admin user, if the from principal has delegate permissions
             if not self.get_current_principal().is_admin() and not self.__permissions.check_permission(tgt, from_principal, Right.DELEGATE):
                 raise SecurityViolation("principal specified does not have permissions to delegate")
             elif self.__global_store.read_record(tgt) is None:
                 raise RecordKeyError("record does not exist in the global store")
-            self.__permissions.add_permissions(tgt, from_principal, to_principal, right)
+            self.__changes.permissions.add((tgt, to_principal))
+            self.__permissions.add_permissions(tgt, from_principal, to_principal, right, journal=self.__journal)
 
     def delete_delegation(self, tgt, from_principal, to_principal, right):
         """
@@ -405,15 +458,15 @@ class Database:
             for elem in from_rights:
                 # Checking whether the principal has delegate permission on object and element exists in global store
                 if self.__permissions.check_permission(elem, from_principal, Right.DELEGATE) and self.__global_store.read_record(elem) is not None:
-                    self.__permissions.delete_permission(elem, from_principal, to_principal, right)
-                    self.__cache.reset(elem, right) # Resetting the cached permissions because they become invalid now
+                    self.__changes.permissions.add((elem, to_principal))
+                    self.__permissions.delete_permission(elem, from_principal, to_principal, right, journal=self.__journal)
         else:
             if not self.get_current_principal().is_admin() and self.get_current_principal().get_username() != to_principal and not self.__permissions.check_permission(tgt, from_principal, Right.DELEGATE):
                 raise SecurityViolation("principal specified does not have permissions to delegate")
             elif self.__global_store.read_record(tgt) is None:
                 raise RecordKeyError("record does not exist in the global store")
-            self.__permissions.delete_permission(tgt, from_principal, to_principal, right)
-            self.__cache.reset(tgt, right)
+            self.__changes.permissions.add((tgt, to_principal))
+            self.__permissions.delete_permission(tgt, from_principal, to_principal, right, journal=self.__journal)
 
     def set_default_delegator(self, username):
         """
@@ -433,21 +486,142 @@ class Database:
             raise PrincipalKeyError("username for principal does not exist in database")
         if not self.get_current_principal().is_admin():
             raise SecurityViolation("current principal is not admin user")
+        if self.__journal is not None:
+            self.__journal.record(self.__restore_default_delegator, self.__default_delegator)
+        self.__changes.default_delegator = True
         self.__default_delegator = username
 
     def reset(self, rollback):
         """
         The function to reset values after a program has completed on the database
         """
-        if rollback:
-            self.__principals = self.__backup_principals
-            self.__default_delegator = self.__backup_default_delegator
-            self.__global_store = self.__backup_global_store
-            self.__permissions = self.__backup_permissions
+        if rollback and self.__journal is not None:
+            self.__journal.rollback()
+        elif not rollback and self.__storage is not None and not self.__changes.empty():
+            self.__commit()
+        self.__journal = None
+        self.__changes = Changes()
 
         self.__current_principal = None
         self.__local_store = Store()
-        self.__cache = Cache()
+
+    def __commit(self):
+        """
+        The function to write the changes made by the current transaction to storage
+        """
+        entry = {
+            "records": {},
+            "deleted_records": [],
+            "principals": {},
+            "deleted_principals": [],
+            "permissions": []
+        }
+
+        for record_name in self.__changes.records:
+            value = self.__global_store.read_record(record_name)
+            if value is None:
+                entry["deleted_records"].append(record_name)
+            else:
+                entry["records"][record_name] = value
+        for username in self.__changes.principals:
+            if username in self.__principals:
+                entry["principals"][username] = self.__principals[username].serialize()
+            else:
+                entry["deleted_principals"].append(username)
+        for record_name, principal in self.__changes.permissions:
+            rights = self.__permissions.return_rights(record_name, principal)
+            entry["permissions"].append([record_name, principal, {right.name: sorted(delegators) for right, delegators in rights.items()}])
+        if self.__changes.default_delegator:
+            entry["default_delegator"] = self.__default_delegator
+
+        if self.__storage.commit(entry):
+            self.__storage.snapshot(self.dump_state())
+
+    def __apply(self, entry):
+        """
+        The function to apply a committed transaction that was loaded from storage
+        """
+        for record_name, value in entry["records"].items():
+            self.__global_store.set_record(record_name, value)
+        for record_name in entry["deleted_records"]:
+            self.__global_store.delete_record(record_name)
+        for username, data in entry["principals"].items():
+            self.__principals[username] = Principal.deserialize(data)
+        for username in entry["deleted_principals"]:
+            self.__principals.pop(username, None)
+        for record_name, principal, rights in entry["permissions"]:
+            for right, delegators in self.__permissions.return_rights(record_name, principal).items():
+                for delegator in delegators:
+                    self.__permissions.delete_permission(record_name, delegator, principal, right)
+            for right, delegators in rights.items():
+                for delegator in delegators:
+                    self.__permissions.add_permissions(record_name, delegator, principal, Right[right])
+        if "default_delegator" in entry:
+            self.__default_delegator = entry["default_delegator"]
+
+    def __load(self):
+        """
+        The function to load the database from storage, or to store the new database if it has not been stored before
+        """
+        snapshot, entries = self.__storage.load()
+
+        if snapshot is None and not entries:
+            self.__storage.snapshot(self.dump_state())
+            return
+
+        if snapshot is not None:
+            # Records are decoded from the snapshot when they are first accessed
+            self.__global_store = Store(snapshot)
+            self.__principals = {username: Principal.deserialize(data) for username, data in snapshot.meta["principals"].items()}
+            self.__default_delegator = snapshot.meta["default_delegator"]
+            for record_name, from_principal, to_principal, right in snapshot.meta["permissions"]:
+                self.__permissions.add_permissions(record_name, from_principal, to_principal, Right[right])
+        for entry in entries:
+            self.__apply(entry)
+
+    def dump_state(self):
+        """
+        The function to return the whole database as a dictionary that can be stored on disk
+
+        Returns:
+            dict: The principals, default delegator, global records and delegations of the database
+        """
+        return {
+            "principals": {username: p.serialize() for username, p in self.__principals.items()},
+            "default_delegator": self.__default_delegator,
+            "records": {record_name: self.__global_store.read_record(record_name) for record_name in self.__global_store.return_record_keys()},
+            "permissions": [[record_name, from_principal, to_principal, right.name]
+                            for record_name, from_principal, to_principal, right in self.__permissions.return_delegations()]
+        }
+
+    def last_commit(self):
+        """
+        The function to return the sequence number of the last transaction written to storage
+
+        Returns:
+            int: The sequence number, or 0 if the database is not persistent
+        """
+        if self.__storage is None:
+            return 0
+        return self.__storage.seq
+
+    def sync(self, seq=None):
+        """
+        The function to wait until a transaction written to storage is durable. This can be called from
+        any thread, so replies can wait for their transaction while later programs are executed.
+
+        Parameters:
+            seq (int): The sequence number of the transaction, or the last transaction if it is not given
+        """
+        if self.__storage is not None:
+            self.__storage.sync(seq)
+
+    def close(self):
+        """
+        The function to sync and close the storage of the database
+        """
+        if self.__storage is not None:
+            self.__storage.close()
 
     def exit(self):
         """
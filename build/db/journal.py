@@ -0,0 +1,39 @@
+class Journal:
+    """
+    This is the class for the undo journal of a transaction on the database
+
+    Attributes:
+        entries ([(function, tuple)]): The inverse operations in the order that the changes were made
+    """
+
+    def __init__(self):
+        """
+        The constructor for Journal class.
+
+        - Initializes the journal to have no entries
+        """
+
+        self.__entries = []
+
+    def record(self, undo, *args):
+        """
+        The function to record the inverse of a change that was just made.
+
+        Parameters:
+            undo (function): The function that reverts the change
+            args (tuple): The arguments that are passed to the function
+        """
+
+        self.__entries.append((undo, args))
+
+    def rollback(self):
+        """
+        The function to revert every recorded change by replaying the inverse operations backwards
+        """
+
+        while self.__entries:
+            undo, args = self.__entries.pop()
+            undo(*args)
+
+    def __len__(self):
+        return len(self.__entries)
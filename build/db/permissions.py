@@ -22,6 +22,9 @@ class Permissions:
 
     Attributes:
         data (dict): The data store for principal permissions
+        grants (dict): The principals that each principal has given a right to on each record
+        reach (dict): Map from a record and right to the principals whose delegations trace back to admin
+        listeners ([function]): Functions called with the record and right when the principals that have a right change
     """
 
     def __init__(self):
@@ -29,11 +32,29 @@ class Permissions:
         The constructor for Permissions class.
 
         - Initializes the data store to an empty dictionary.
+        - Initializes the delegation index to an empty dictionary.
         """
 
         self.__data = dict()
+        self.__grants = dict()
+        self.__reach = dict()
+        self.__listeners = []
+
+    def add_listener(self, listener):
+        """
+        The function to register a function to be called when the principals that have a right on a record change.
+
+        Parameters:
+            listener (function): Called with the record name and the right that changed
+        """
+
+        self.__listeners.append(listener)
+
+    def __notify(self, record_name, right):
+        for listener in self.__listeners:
+            listener(record_name, right)
     
-    def add_permissions(self, record_name, from_principal, to_principal, rights):
+    def add_permissions(self, record_name, from_principal, to_principal, rights, journal=None):
         """
         The function to add a mapping that a principal gives a set of rights to another principal.
 
@@ -42,24 +63,84 @@ class Permissions:
             from_principal (string): The username of the principal giving rights.
             to_principal (string): The username of the principal receiving rights.
             rights ([Right]): A list of rights to give to the principal. 
+            journal (Journal): The journal to record the inverse operations in
         """
 
+        if isinstance(rights, Right):
+            rights = [rights]
+        elif not isinstance(rights, list):
+            raise PermissionsKeyError("right type does not exist")
+
         if to_principal not in self.__data:
             self.__data[to_principal] = dict()
         if record_name not in self.__data[to_principal]:
             self.__data[to_principal][record_name] = dict()
-        
-        if isinstance(rights, list):
-            for right in rights:
-                if right not in self.__data[to_principal][record_name]:
-                    self.__data[to_principal][record_name][right] = set()
-                self.__data[to_principal][record_name][right].add(from_principal)
-        elif isinstance(rights, Right):
-            if rights not in self.__data[to_principal][record_name]:
-                self.__data[to_principal][record_name][rights] = set()
-            self.__data[to_principal][record_name][rights].add(from_principal)
-        else:
-            raise PermissionsKeyError("right type does not exist")
+
+        for right in rights:
+            if right not in self.__data[to_principal][record_name]:
+                self.__data[to_principal][record_name][right] = set()
+            if from_principal in self.__data[to_principal][record_name][right]:
+                continue
+            if journal is not None:
+                journal.record(self.delete_permission, record_name, from_principal, to_principal, right)
+            self.__data[to_principal][record_name][right].add(from_principal)
+            self.__add_grant(record_name, from_principal, to_principal, right)
+
+    def __add_grant(self, record_name, from_principal, to_principal, right):
+        """
+        The function to add a delegation to the index and extend the principals that trace back to admin
+        """
+
+        grants = self.__grants.setdefault((record_name, right), dict())
+        grants.setdefault(from_principal, set()).add(to_principal)
+
+        reach = self.__reach.get((record_name, right), set())
+        if from_principal == "admin" or from_principal in reach:
+            self.__extend_reach(record_name, right, to_principal)
+
+    def __extend_reach(self, record_name, right, principal):
+        """
+        The function to add a principal, and every principal it has delegated the right to, to the
+        principals that trace back to admin
+        """
+
+        reach = self.__reach.setdefault((record_name, right), set())
+        grants = self.__grants.get((record_name, right), dict())
+        if principal in reach:
+            return
+        self.__notify(record_name, right)
+
+        q = deque()
+        q.append(principal)
+        reach.add(principal)
+
+        while q:
+            s = q.popleft()
+            for delegatee in grants.get(s, ()):
+                if delegatee not in reach:
+                    q.append(delegatee)
+                    reach.add(delegatee)
+
+    def __remove_grant(self, record_name, from_principal, to_principal, right):
+        """
+        The function to remove a delegation from the index and recompute the principals that trace back to admin
+        """
+
+        grants = self.__grants[(record_name, right)]
+        grants[from_principal].discard(to_principal)
+        if len(grants[from_principal]) == 0:
+            del grants[from_principal]
+        if len(grants) == 0:
+            del self.__grants[(record_name, right)]
+
+        if to_principal not in self.__reach.get((record_name, right), set()):
+            return
+
+        # Removing a delegation can revoke the right from any principal after it, so the index is rebuilt from admin
+        del self.__reach[(record_name, right)]
+        self.__notify(record_name, right)
+        for delegatee in list(self.__grants.get((record_name, right), dict()).get("admin", ())):
+            self.__extend_reach(record_name, right, delegatee)
 
     def check_permission(self, record_name, principal, right):
         """
@@ -80,33 +161,31 @@ class Permissions:
 
         if principal == "admin":
             return True
-        if self.check_permission_helper(record_name, "anyone", right):
-            return True
-        if self.check_permission_helper(record_name, principal, right):
-            return True
-        return False
+        reach = self.__reach.get((record_name, right), ())
+        return "anyone" in reach or principal in reach
 
     def check_permission_helper(self, record_name, principal, right):
-        visited = set()
-        q = deque()
-
-        q.append(principal)
-        visited.add(principal)
-
-        # Doing a BFS to check permissions and ensure that permission have been passed on correctly
-        while q:
-            s = q.popleft()
+        """
+        The function to check whether the delegations of a right to a principal trace back to admin
+        """
+        return principal in self.__reach.get((record_name, right), ())
 
-            delegators = self.__data.get(s, dict()).get(record_name, dict()).get(right, None)
+    def return_rights(self, record_name, principal):
+        """
+        Return the principals that have given each right on a record to the principal
+        """
+        rights = self.__data.get(principal, dict()).get(record_name, dict())
+        return {right: set(delegators) for right, delegators in rights.items()}
 
-            if delegators:
-                for delegator in delegators:
-                    if delegator == "admin":
-                        return True
-                    if delegator not in visited:
-                        q.append(delegator)
-                        visited.add(delegator)
-        return False
+    def return_delegations(self):
+        """
+        Return every delegation as a (record name, from principal, to principal, right) tuple
+        """
+        return [(record_name, from_principal, to_principal, right)
+                for to_principal, records in self.__data.items()
+                for record_name, rights in records.items()
+                for right, delegators in rights.items()
+                for from_principal in delegators]
 
     def return_permission_keys(self, principal):
         """
@@ -114,7 +193,7 @@ class Permissions:
         """
         return self.__data.get(principal, dict()).keys()
 
-    def delete_permission(self, record_name, from_principal, to_principal, right):
+    def delete_permission(self, record_name, from_principal, to_principal, right, journal=None):
         """
         The function to delete a given right delegation from one principal to another
 
@@ -123,6 +202,7 @@ class Permissions:
             from_principal (string): The username of the principal giving rights.
             to_principal (string): The username of the principal receiving rights.
             right (Right): The right to remove from the delegation.
+            journal (Journal): The journal to record the inverse operation in
         """
 
         if to_principal not in self.__data:
@@ -131,7 +211,12 @@ class Permissions:
             return
         if right not in self.__data[to_principal][record_name]:
             return
+        if from_principal not in self.__data[to_principal][record_name][right]:
+            return
+        if journal is not None:
+            journal.record(self.add_permissions, record_name, from_principal, to_principal, right)
         self.__data[to_principal][record_name][right].discard(from_principal)
+        self.__remove_grant(record_name, from_principal, to_principal, right)
 
         # Removing permissions from the system if the elements of the permissions object is empty
         if len(self.__data[to_principal][record_name][right]) == 0:
@@ -88,3 +88,37 @@ class Principal:
 
         self.__password = hashlib.sha256(new_password.encode('utf-8')).hexdigest()
         return True
+
+    def serialize(self):
+        """
+        The function to convert the principal to a dictionary that can be stored on disk.
+
+        Returns:
+            dict: The username, hashed password and flags of the principal
+        """
+
+        return {
+            "username": self.__username,
+            "password": self.__password,
+            "admin": self.__admin,
+            "accessible": self.__accessible
+        }
+
+    @classmethod
+    def deserialize(cls, data):
+        """
+        The function to create a principal from a dictionary returned by serialize.
+
+        Parameters:
+            data (dict): The username, hashed password and flags of the principal
+
+        Returns:
+            Principal: The principal
+        """
+
+        p = cls.__new__(cls)
+        p.__username = data["username"]
+        p.__password = data["password"]
+        p.__admin = data["admin"]
+        p.__accessible = data["accessible"]
+        return p
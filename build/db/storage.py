@@ -0,0 +1,316 @@
+from db.store import MISSING
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+class Changes:
+    """
+    This is the class for the parts of the database that have been modified by a transaction
+
+    Attributes:
+        records (set(string)): The names of the global records that have been modified
+        principals (set(string)): The usernames of the principals that have been modified
+        permissions (set((string, string))): The records and principals whose received rights have been modified
+        default_delegator (bool): Whether the default delegator has been modified
+    """
+
+    def __init__(self):
+        self.records = set()
+        self.principals = set()
+        self.permissions = set()
+        self.default_delegator = False
+
+    def empty(self):
+        return not (self.records or self.principals or self.permissions or self.default_delegator)
+
+
+class Snapshot:
+    """
+    This is the class for a snapshot of the database that is memory mapped from disk. The snapshot begins
+    with a header, followed by the encoded records, their names, an index of the records sorted by name and
+    the rest of the database. Opening a snapshot only reads the header and the rest of the database, and each
+    record is found by a binary search of the index and decoded when it is read.
+
+    Attributes:
+        meta (dict): The principals, default delegator, delegations and sequence number of the snapshot
+    """
+
+    MAGIC = b'SDBSNAP1'
+    # magic, meta offset, meta length, record count, index offset
+    HEADER = struct.Struct('<8sQQQQ')
+    # name offset, name length, value offset, value length
+    ENTRY = struct.Struct('<QIQI')
+
+    def __init__(self, path):
+        """
+        The constructor for Snapshot class.
+
+        Parameters:
+            path (string): The file that the snapshot is stored in
+
+        Errors:
+            ValueError(): If the file is not a snapshot
+        """
+
+        with open(path, 'rb') as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_offset, meta_length, self.__count, self.__index = self.HEADER.unpack_from(self.__map, 0)
+        if magic != self.MAGIC:
+            raise ValueError("not a snapshot")
+        self.meta = json.loads(self.__map[meta_offset:meta_offset + meta_length].decode('ascii'))
+
+    @classmethod
+    def write(cls, f, state):
+        """
+        The function to write the whole database to a file in the snapshot format
+
+        Parameters:
+            f (file): The binary file to write the snapshot to
+            state (dict): The whole database
+        """
+
+        f.write(b'\0' * cls.HEADER.size)
+        offset = cls.HEADER.size
+
+        entries = []
+        for record_name in sorted(state["records"]):
+            name = record_name.encode('ascii')
+            value = json.dumps(state["records"][record_name], separators=(',', ':')).encode('ascii')
+            f.write(name)
+            f.write(value)
+            entries.append(cls.ENTRY.pack(offset, len(name), offset + len(name), len(value)))
+            offset += len(name) + len(value)
+
+        index = offset
+        for entry in entries:
+            f.write(entry)
+        offset += cls.ENTRY.size * len(entries)
+
+        meta = json.dumps({key: value for key, value in state.items() if key != "records"},
+                          separators=(',', ':')).encode('ascii')
+        f.write(meta)
+
+        f.seek(0)
+        f.write(cls.HEADER.pack(cls.MAGIC, offset, len(meta), len(entries), index))
+
+    def __entry(self, i):
+        return self.ENTRY.unpack_from(self.__map, self.__index + i * self.ENTRY.size)
+
+    def read(self, record_name):
+        """
+        The function to read a record from the snapshot
+
+        Parameters:
+            record_name (string): The name of the record
+
+        Returns:
+            value (string | dict | list | MISSING): The decoded record, or MISSING if it is not in the snapshot
+        """
+
+        name = record_name.encode('ascii')
+        low, high = 0, self.__count
+        while low < high:
+            mid = (low + high) // 2
+            name_offset, name_length, value_offset, value_length = self.__entry(mid)
+            other = self.__map[name_offset:name_offset + name_length]
+            if other < name:
+                low = mid + 1
+            elif other > name:
+                high = mid
+            else:
+                return json.loads(self.__map[value_offset:value_offset + value_length].decode('ascii'))
+        return MISSING
+
+    def names(self):
+        """
+        Return the names of all of the records in the snapshot
+        """
+        for i in range(self.__count):
+            name_offset, name_length, _, _ = self.__entry(i)
+            yield self.__map[name_offset:name_offset + name_length].decode('ascii')
+
+    def __len__(self):
+        return self.__count
+
+
+class Storage:
+    """
+    This is the class for the on-disk storage of the database. Committed transactions are appended to
+    a log and the log is periodically compacted into a snapshot of the whole database, so that a restart
+    loads the snapshot and only replays the transactions committed since. Commits are made durable by
+    group commit: a single sync of the log covers every commit written before it started, so commits
+    that arrive while the log is being synced are made durable together by the next sync.
+
+    Attributes:
+        path (string): The directory that the snapshot and log are stored in.
+        commit_delay (float): The number of seconds that a sync waits for more commits to join it.
+        compact_every (int): The number of commits between snapshots.
+        seq (int): The sequence number of the last commit.
+        synced (int): The sequence number of the last commit that is durable.
+    """
+
+    SNAPSHOT = 'snapshot.bin'
+    LOG = 'log.jsonl'
+
+    def __init__(self, path, commit_delay=0.0, compact_every=1000):
+        """
+        The constructor for Storage class.
+
+        Parameters:
+            path (string): The directory that the snapshot and log are stored in.
+            commit_delay (float): The number of seconds that a sync waits for more commits to join it.
+            compact_every (int): The number of commits between snapshots.
+
+        - Creates the directory if it does not exist
+        """
+
+        self.path = path
+        self.commit_delay = commit_delay
+        self.compact_every = compact_every
+        self.seq = 0
+        self.synced = 0
+
+        self.__log = None
+        self.__since_snapshot = 0
+        # Guards the log file and sequence number against the thread that syncs the log
+        self.__lock = threading.Lock()
+        # Held by the one sync in progress; commits waiting to be durable queue on it
+        self.__sync_lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+
+    def load(self):
+        """
+        The function to load the snapshot and the transactions committed after it.
+
+        Returns:
+            (Snapshot | None, [dict]): The snapshot, or None if there is none, and the log entries to replay in order
+        """
+
+        snapshot = None
+        snapshot_path = os.path.join(self.path, self.SNAPSHOT)
+        if os.path.exists(snapshot_path):
+            snapshot = Snapshot(snapshot_path)
+            self.seq = snapshot.meta['seq']
+
+        entries = []
+        log_path = os.path.join(self.path, self.LOG)
+        if os.path.exists(log_path):
+            valid_length = 0
+            with open(log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line.decode('ascii'))
+                    except ValueError:
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    valid_length += len(line)
+                    if entry['seq'] > self.seq:
+                        entries.append(entry)
+                        self.seq = entry['seq']
+
+            # The last commit was not completely written before a crash, so it is removed from the log
+            if valid_length != os.path.getsize(log_path):
+                os.truncate(log_path, valid_length)
+
+        self.synced = self.seq
+        self.__since_snapshot = len(entries)
+        self.__log = open(log_path, 'a')
+        return snapshot, entries
+
+    def commit(self, entry):
+        """
+        The function to append a committed transaction to the log. The commit is not durable until
+        the log is synced up to its sequence number.
+
+        Parameters:
+            entry (dict): The changes made by the transaction
+
+        Returns:
+            bool: Whether the database should be compacted into a new snapshot
+        """
+
+        with self.__lock:
+            self.seq += 1
+            entry['seq'] = self.seq
+            self.__log.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.__log.flush()
+
+        self.__since_snapshot += 1
+        return self.__since_snapshot >= self.compact_every
+
+    def sync(self, seq=None):
+        """
+        The function to wait until a commit is durable. If no other sync is in progress the log is synced,
+        otherwise the commit waits for that sync and is synced by the next one if it was not covered.
+
+        Parameters:
+            seq (int): The sequence number of the commit, or the last commit if it is not given
+        """
+
+        if seq is None:
+            seq = self.seq
+
+        with self.__sync_lock:
+            if self.synced >= seq:
+                return
+            if self.commit_delay:
+                time.sleep(self.commit_delay)
+
+            with self.__lock:
+                target = self.seq
+                fd = self.__log.fileno()
+            os.fsync(fd)
+            self.synced = target
+
+    def snapshot(self, state):
+        """
+        The function to replace the snapshot with the whole database and empty the log.
+
+        Parameters:
+            state (dict): The whole database
+        """
+
+        with self.__sync_lock:
+            self.__snapshot(state)
+
+    def __snapshot(self, state):
+        state['seq'] = self.seq
+        snapshot_path = os.path.join(self.path, self.SNAPSHOT)
+        tmp_path = snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            Snapshot.write(f, state)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        self.__sync_directory()
+
+        # Entries in the old log are skipped by their sequence number if the truncation is lost
+        with self.__lock:
+            self.__log.close()
+            self.__log = open(os.path.join(self.path, self.LOG), 'w')
+        self.synced = state['seq']
+        self.__since_snapshot = 0
+
+    def __sync_directory(self):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """
+        The function to sync the log and close it
+        """
+
+        if self.__log is not None:
+            self.sync()
+            self.__log.close()
+            self.__log = None
@@ -14,28 +14,68 @@ class RecordKeyError(Exception):
     pass
 
 
+MISSING = object()
+
+
 class Store:
     """
     This is the class for stores in the database
 
     Attributes:
         store (dict({string: string | dict | list)): The records stored in the database
+        snapshot (Snapshot): The snapshot that records are loaded from the first time they are accessed
+        loaded (set(string)): The names of the records that have been looked up in the snapshot
     """
-    def __init__(self):
+    def __init__(self, snapshot=None):
         self.__store = {} 
+        self.__snapshot = snapshot
+        self.__loaded = set()
+
+    def __load_record(self, record_name):
+        """
+        The function to copy a record out of the snapshot the first time it is accessed, so that only
+        the records that are used are decoded
+        """
+
+        if self.__snapshot is not None and record_name not in self.__loaded:
+            self.__loaded.add(record_name)
+            value = self.__snapshot.read(record_name)
+            if value is not MISSING:
+                self.__store[record_name] = value
 
-    def set_record(self, record_name, value):
+    def set_record(self, record_name, value, journal=None):
         """
         The function to set the record with the given name to the given value.
 
         Parameters:
             record_name (string): The name of the record
             expr (string | dict | list): The value or reference associated with the record
+            journal (Journal): The journal to record the inverse operation in
         """
 
+        self.__load_record(record_name)
+        if journal is not None:
+            journal.record(self.__restore_record, record_name, self.__store.get(record_name, MISSING))
         self.__store[record_name] = copy.deepcopy(value)
 
-    def append_record(self, record_name, value):
+    def __restore_record(self, record_name, value):
+        """
+        The function to restore a record to the value it had before it was set
+        """
+
+        if value is MISSING:
+            self.__store.pop(record_name, None)
+        else:
+            self.__store[record_name] = value
+
+    def __truncate_record(self, record_name, length):
+        """
+        The function to restore a list record to the length it had before it was appended to
+        """
+
+        del self.__store[record_name][length:]
+
+    def append_record(self, record_name, value, journal=None):
         """
         The function to append the record with the given name with the given value.
 
@@ -43,16 +83,20 @@ class Store:
             record_name (string): The name of the record
             expr (string | dict | list): The value or reference to be appended to the record
             is_ref (bool): Whether the element is a literal value or a reference
+            journal (Journal): The journal to record the inverse operation in
 
         Errors:
             AppendException(): If the value associated with the record name is not a list
         """
 
+        self.__load_record(record_name)
         record = self.__store[record_name]
 
         if not isinstance(record, list):
             raise AppendException("unable to append record to non-list object")
         else:
+            if journal is not None:
+                journal.record(self.__truncate_record, record_name, len(record))
             if isinstance(value, list):
                 gc.disable()
                 record.extend(value)
@@ -75,30 +119,45 @@ class Store:
             value (string | dict | list | None): A deepcopy of the original record
         """
 
+        split_record_name = record_name.split('.')
+        self.__load_record(split_record_name[0])
         record = self.__store
-        for elem in record_name.split('.'):
+        for elem in split_record_name:
             if elem not in record:
                 return None
             record = record[elem]
         return record
 
-    def delete_record(self, record_name):
+    def return_record_keys(self):
+        """
+        Return the names of all of the records in the store
+        """
+        if self.__snapshot is not None:
+            for record_name in self.__snapshot.names():
+                self.__load_record(record_name)
+        return self.__store.keys()
+
+    def delete_record(self, record_name, journal=None):
         """
         The function to delete the record from the store. Recursively reads the record
         from the database reading each of the dots of the reference
 
         Parameters:
             record_name (string): The name of the record
+            journal (Journal): The journal to record the inverse operation in
 
         Errors:
             RecordKeyError(): If the record does not exist in the store
         """
 
-        record = self.__store
         split_record_name = record_name.split('.')
+        self.__load_record(split_record_name[0])
+        record = self.__store
         for i in range(len(split_record_name) - 1):
             if split_record_name[i] not in record:
                 return RecordKeyError("record not in database")
             record = record[split_record_name[i]]
-        
+
+        if journal is not None:
+            journal.record(record.__setitem__, split_record_name[-1], record[split_record_name[-1]])
         del record[split_record_name[-1]]
@@ -851,3 +851,127 @@ class Test_Reset:
         with pytest.raises(SecurityViolation) as excinfo:
             d.get_current_principal()
         assert "current principal is not set" in str(excinfo.value)
+
+
+class Test_Rollback:
+
+    def test_rollback_records(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.set_record("x", ["first"])
+        d.set_record("y", "element")
+        d.reset(rollback=False)
+
+        d.create_backups()
+        d.set_principal("admin", "test")
+        d.append_record("x", "second")
+        d.set_record("y", "another element")
+        d.set_record("z", "new element")
+        d.reset(rollback=True)
+
+        d.set_principal("admin", "test")
+        assert d.return_record("x") == ["first"]
+        assert d.return_record("y") == "element"
+        with pytest.raises(RecordKeyError) as excinfo:
+            d.return_record("z")
+        assert "record does not exist in the database" in str(excinfo.value)
+
+    def test_rollback_principals(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.create_principal("bob", "password")
+        d.reset(rollback=False)
+
+        d.create_backups()
+        d.set_principal("admin", "test")
+        d.change_password("bob", "newpassword")
+        d.create_principal("alice", "password")
+        d.set_default_delegator("bob")
+        d.reset(rollback=True)
+
+        assert d.get_principal("bob").authenticate("password")
+        with pytest.raises(PrincipalKeyError) as excinfo:
+            d.get_principal("alice")
+        assert "username for principal does not exist" in str(excinfo.value)
+
+    def test_rollback_permissions(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.create_principal("bob", "password")
+        d.set_record("x", "element")
+        d.reset(rollback=False)
+
+        d.create_backups()
+        d.set_principal("admin", "test")
+        d.set_delegation("x", "admin", "bob", Right.READ)
+        d.reset(rollback=True)
+
+        d.set_principal("bob", "password")
+        with pytest.raises(SecurityViolation) as excinfo:
+            d.return_record("x")
+        assert "principal does not have read permission on record" in str(excinfo.value)
+
+    def test_rollback_new_record_permissions(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.create_principal("bob", "password")
+        d.reset(rollback=False)
+
+        d.create_backups()
+        d.set_principal("bob", "password")
+        d.set_record("x", "element")
+        d.reset(rollback=True)
+
+        d.set_principal("admin", "test")
+        d.set_record("x", "admin element")
+        d.reset(rollback=False)
+
+        d.set_principal("bob", "password")
+        with pytest.raises(SecurityViolation) as excinfo:
+            d.return_record("x")
+        assert "principal does not have read permission on record" in str(excinfo.value)
+
+
+class Test_Permission_Cache:
+
+    def test_delete_delegation_revokes_downstream(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.create_principal("bob", "password")
+        d.create_principal("carol", "password")
+        d.set_record("x", "element")
+        d.set_delegation("x", "admin", "bob", ALL_RIGHTS)
+        d.set_delegation("x", "bob", "carol", Right.READ)
+        d.reset(rollback=False)
+
+        d.set_principal("carol", "password")
+        assert d.return_record("x") == "element"
+        d.reset(rollback=False)
+
+        d.set_principal("admin", "test")
+        d.delete_delegation("x", "admin", "bob", Right.READ)
+        d.reset(rollback=False)
+
+        d.set_principal("carol", "password")
+        with pytest.raises(SecurityViolation) as excinfo:
+            d.return_record("x")
+        assert "principal does not have read permission on record" in str(excinfo.value)
+
+    def test_rollback_revokes_cached_permission(self):
+        d = Database("test")
+        d.set_principal("admin", "test")
+        d.create_principal("bob", "password")
+        d.set_record("x", "element")
+        d.reset(rollback=False)
+
+        d.create_backups()
+        d.set_principal("admin", "test")
+        d.set_delegation("x", "admin", "bob", Right.READ)
+        d.set_principal("bob", "password")
+        assert d.return_record("x") == "element"
+        d.reset(rollback=True)
+
+        d.set_principal("bob", "password")
+        with pytest.raises(SecurityViolation) as excinfo:
+            d.return_record("x")
+        assert "principal does not have read permission on record" in str(excinfo.value)
@@ -1,4 +1,5 @@
 from db.permissions import Permissions, Right, ALL_RIGHTS
+from db.journal import Journal
 
 
 class Test_Add_Permissions:
@@ -111,6 +112,62 @@ class Test_Delete_Permission:
 
         p.delete_permission("x", "bob", "dave", Right.READ)
 
+class Test_Delegation_Chains:
+
+    def test_delete_middle_of_chain(self):
+        p = Permissions()
+
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+        p.add_permissions("x", "alice", "bob", [Right.READ])
+        p.add_permissions("x", "bob", "charlie", [Right.READ])
+
+        p.delete_permission("x", "alice", "bob", Right.READ)
+
+        assert p.check_permission("x", "alice", Right.READ)
+        assert not p.check_permission("x", "bob", Right.READ)
+        assert not p.check_permission("x", "charlie", Right.READ)
+
+    def test_delete_with_other_path(self):
+        p = Permissions()
+
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+        p.add_permissions("x", "admin", "bob", [Right.READ])
+        p.add_permissions("x", "alice", "charlie", [Right.READ])
+        p.add_permissions("x", "bob", "charlie", [Right.READ])
+
+        p.delete_permission("x", "admin", "alice", Right.READ)
+
+        assert not p.check_permission("x", "alice", Right.READ)
+        assert p.check_permission("x", "charlie", Right.READ)
+
+    def test_cycle(self):
+        p = Permissions()
+
+        p.add_permissions("x", "alice", "bob", [Right.READ])
+        p.add_permissions("x", "bob", "alice", [Right.READ])
+
+        assert not p.check_permission("x", "alice", Right.READ)
+
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+
+        assert p.check_permission("x", "alice", Right.READ)
+        assert p.check_permission("x", "bob", Right.READ)
+
+        p.delete_permission("x", "admin", "alice", Right.READ)
+
+        assert not p.check_permission("x", "alice", Right.READ)
+        assert not p.check_permission("x", "bob", Right.READ)
+
+    def test_anyone_chain(self):
+        p = Permissions()
+
+        p.add_permissions("x", "alice", "anyone", [Right.READ])
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+
+        assert p.check_permission("x", "bob", Right.READ)
+        assert not p.check_permission("x", "bob", Right.WRITE)
+
+
 class Test_Return_Permission_Keys:
 
     def test_num_permission_keys(self):
@@ -123,4 +180,34 @@ class Test_Return_Permission_Keys:
 
         p.delete_permission("x", "admin", "alice", Right.READ)
 
-        assert 0 == len(p.return_permission_keys("alice"))
\ No newline at end of file
+        assert 0 == len(p.return_permission_keys("alice"))
+
+
+class Test_Journal:
+
+    def test_rollback_add_permissions(self):
+        p = Permissions()
+        j = Journal()
+
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+        p.add_permissions("x", "admin", "alice", ALL_RIGHTS, journal=j)
+        p.add_permissions("x", "alice", "bob", [Right.READ], journal=j)
+        j.rollback()
+
+        assert p.check_permission("x", "alice", Right.READ)
+        assert not p.check_permission("x", "alice", Right.WRITE)
+        assert not p.check_permission("x", "bob", Right.READ)
+        assert 0 == len(p.return_permission_keys("bob"))
+
+    def test_rollback_delete_permission(self):
+        p = Permissions()
+        j = Journal()
+
+        p.add_permissions("x", "admin", "alice", [Right.READ])
+        p.delete_permission("x", "admin", "alice", Right.READ, journal=j)
+        p.delete_permission("x", "admin", "alice", Right.WRITE, journal=j)
+        assert not p.check_permission("x", "alice", Right.READ)
+        assert len(j) == 1
+        j.rollback()
+
+        assert p.check_permission("x", "alice", Right.READ)
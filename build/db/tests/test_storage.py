@@ -0,0 +1,201 @@
+from db.database import Database, PrincipalKeyError, SecurityViolation
+from db.permissions import Right
+from db.journal import Journal
+from db.storage import Snapshot, Storage
+from db.store import MISSING, Store
+import os
+import pytest
+import threading
+
+
+def populate(d):
+    d.set_principal("admin", "test")
+    d.create_principal("bob", "password")
+    d.set_record("x", ["first"])
+    d.set_record("y", {"name": "value"})
+    d.set_delegation("x", "admin", "bob", Right.READ)
+    d.reset(rollback=False)
+
+
+class Test_Storage:
+
+    def test_reload(self, tmp_path):
+        d = Database("test", storage=Storage(str(tmp_path)))
+        populate(d)
+        d.close()
+
+        d = Database("other", storage=Storage(str(tmp_path)))
+        d.set_principal("bob", "password")
+        assert d.return_record("x") == ["first"]
+        with pytest.raises(SecurityViolation):
+            d.return_record("y")
+        d.reset(rollback=False)
+
+        # The admin password is the one stored with the database
+        d.set_principal("admin", "test")
+        assert d.return_record("y") == {"name": "value"}
+        d.close()
+
+    def test_rollback_not_stored(self, tmp_path):
+        d = Database("test", storage=Storage(str(tmp_path)))
+        populate(d)
+
+        d.create_backups()
+        d.set_principal("admin", "test")
+        d.append_record("x", "second")
+        d.create_principal("alice", "password")
+        d.reset(rollback=True)
+        d.close()
+
+        d = Database("test", storage=Storage(str(tmp_path)))
+        d.set_principal("admin", "test")
+        assert d.return_record("x") == ["first"]
+        with pytest.raises(PrincipalKeyError):
+            d.get_principal("alice")
+        d.close()
+
+    def test_delete_delegation_stored(self, tmp_path):
+        d = Database("test", storage=Storage(str(tmp_path)))
+        populate(d)
+        d.set_principal("admin", "test")
+        d.delete_delegation("x", "admin", "bob", Right.READ)
+        d.set_default_delegator("bob")
+        d.reset(rollback=False)
+        d.close()
+
+        d = Database("test", storage=Storage(str(tmp_path)))
+        d.set_principal("bob", "password")
+        with pytest.raises(SecurityViolation):
+            d.return_record("x")
+        assert d.dump_state()["default_delegator"] == "bob"
+        d.close()
+
+    def test_compaction(self, tmp_path):
+        d = Database("test", storage=Storage(str(tmp_path), compact_every=2))
+        populate(d)
+        for i in range(5):
+            d.set_principal("admin", "test")
+            d.append_record("x", str(i))
+            d.reset(rollback=False)
+        d.close()
+
+        with open(os.path.join(str(tmp_path), Storage.LOG)) as f:
+            assert len(f.readlines()) == 0
+
+        d = Database("test", storage=Storage(str(tmp_path)))
+        d.set_principal("admin", "test")
+        assert d.return_record("x") == ["first", "0", "1", "2", "3", "4"]
+        d.close()
+
+    def test_torn_commit(self, tmp_path):
+        d = Database("test", storage=Storage(str(tmp_path)))
+        populate(d)
+        d.close()
+
+        with open(os.path.join(str(tmp_path), Storage.LOG), 'a') as f:
+            f.write('{"records":{"x":')
+
+        d = Database("test", storage=Storage(str(tmp_path)))
+        d.set_principal("admin", "test")
+        assert d.return_record("x") == ["first"]
+        d.append_record("x", "second")
+        d.reset(rollback=False)
+        d.close()
+
+        d = Database("test", storage=Storage(str(tmp_path)))
+        d.set_principal("admin", "test")
+        assert d.return_record("x") == ["first", "second"]
+        d.close()
+
+    def test_group_commit(self, tmp_path, monkeypatch):
+        storage = Storage(str(tmp_path))
+        storage.load()
+        fsyncs = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or fsync(fd))
+
+        for i in range(3):
+            storage.commit({"records": {}})
+        assert storage.synced == 0
+        storage.sync(1)
+        assert storage.synced == 3
+        storage.sync(2)
+        storage.sync(3)
+        assert len(fsyncs) == 1
+        storage.close()
+
+    def test_concurrent_commits_share_sync(self, tmp_path, monkeypatch):
+        storage = Storage(str(tmp_path), commit_delay=0.05)
+        storage.load()
+        fsyncs = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or fsync(fd))
+
+        def commit():
+            storage.commit({"records": {}})
+            storage.sync(storage.seq)
+
+        threads = [threading.Thread(target=commit) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert storage.synced == 8
+        assert len(fsyncs) < 8
+        storage.close()
+
+
+def write_snapshot(tmp_path, records):
+    path = os.path.join(str(tmp_path), Storage.SNAPSHOT)
+    with open(path, 'wb') as f:
+        Snapshot.write(f, {"principals": {}, "default_delegator": "anyone", "records": records,
+                           "permissions": [], "seq": 7})
+    return Snapshot(path)
+
+
+class Test_Snapshot:
+
+    def test_read(self, tmp_path):
+        records = {"r" + str(i): ["value", str(i)] for i in range(100)}
+        records["y"] = {"name": "value"}
+        snapshot = write_snapshot(tmp_path, records)
+        assert len(snapshot) == 101
+        assert snapshot.meta["seq"] == 7
+        assert snapshot.read("r42") == ["value", "42"]
+        assert snapshot.read("y") == {"name": "value"}
+        assert snapshot.read("r100") is MISSING
+        assert snapshot.read("a") is MISSING
+        assert set(snapshot.names()) == set(records)
+
+    def test_empty(self, tmp_path):
+        snapshot = write_snapshot(tmp_path, {})
+        assert len(snapshot) == 0
+        assert snapshot.read("x") is MISSING
+
+    def test_not_snapshot(self, tmp_path):
+        path = os.path.join(str(tmp_path), "other")
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with pytest.raises(ValueError):
+            Snapshot(path)
+
+    def test_store_loads_lazily(self, tmp_path):
+        s = Store(write_snapshot(tmp_path, {"x": ["first"], "y": {"name": "value"}}))
+        assert s.read_record("y.name") == "value"
+        s.append_record("x", "second")
+        assert s.read_record("x") == ["first", "second"]
+
+        s.delete_record("y")
+        assert s.read_record("y") is None
+        assert set(s.return_record_keys()) == {"x"}
+
+    def test_store_rollback(self, tmp_path):
+        s = Store(write_snapshot(tmp_path, {"x": ["first"], "y": "value"}))
+        journal = Journal()
+        s.set_record("x", "other", journal=journal)
+        s.delete_record("y", journal=journal)
+        s.set_record("z", "new", journal=journal)
+        journal.rollback()
+        assert s.read_record("x") == ["first"]
+        assert s.read_record("y") == "value"
+        assert s.read_record("z") is None
@@ -1,4 +1,5 @@
 from db.store import Store, AppendException, ForEachException
+from db.journal import Journal
 import pytest
 
 
@@ -108,3 +109,41 @@ class Test_Append_Record:
         with pytest.raises(AppendException) as excinfo:
             s.append_record("x", "appended record")
         assert "unable to append record to non-list object" in str(excinfo.value)
+
+
+class Test_Journal:
+
+    def test_rollback_set_record(self):
+        s = Store()
+        j = Journal()
+        s.set_record("x", "record")
+
+        s.set_record("x", "another_record", journal=j)
+        s.set_record("y", "new_record", journal=j)
+        j.rollback()
+
+        assert s.read_record("x") == "record"
+        assert s.read_record("y") is None
+
+    def test_rollback_append_record(self):
+        s = Store()
+        j = Journal()
+        s.set_record("x", ["first", "second"])
+
+        s.append_record("x", "third", journal=j)
+        s.append_record("x", ["fourth", "fifth"], journal=j)
+        assert len(j) == 2
+        j.rollback()
+
+        assert s.read_record("x") == ["first", "second"]
+
+    def test_rollback_delete_record(self):
+        s = Store()
+        j = Journal()
+        s.set_record("x", {"name": "Jonathan"})
+
+        s.delete_record("x", journal=j)
+        assert s.read_record("x") is None
+        j.rollback()
+
+        assert s.read_record("x.name") == "Jonathan"
@@ -1,11 +1,42 @@
 import socketserver
 import socket
+import asyncio
+import concurrent.futures
 import copy
 import json
 import signal
+import threading
 
 
 END = '***'
+END_BYTES = END.encode('ascii')
+MAX_PROGRAM_LENGTH = 1000000
+RECV_SIZE = 8192
+TIMEOUT = 30
+
+
+def format_reply(reply):
+    """
+    The function to format the statuses returned by a program into the reply sent to the client.
+
+    Parameters:
+        reply ([dict]): The statuses returned by Parser.parse
+
+    Returns:
+        (bytes, bool): The reply to send to the client and whether the server should exit
+    """
+
+    should_exit = False
+    parsed_elems = []
+
+    for elem in reply:
+        if elem['status'] == 'EXITING':
+            should_exit = True
+        parsed_elems.append(str(json.dumps(elem, separators=(',', ':'))))
+
+    final_reply = '\n'.join(parsed_elems)
+    return final_reply.encode('ascii') + b"\n", should_exit
+
 
 class StoppableServer(socketserver.TCPServer):
     def receiveSignal(self, signalNumber, frame):
@@ -24,38 +55,63 @@ class TCPHandler(socketserver.BaseRequestHandler):
         self.__parser = parser
         super().__init__(*args, **kwargs)
 
+    def receive(self):
+        """
+        The function to receive a program from the client up to the "***" terminator. The data is read
+        into a single growable buffer, only the newly received bytes are searched for the terminator and
+        the program is decoded once when it is complete.
+
+        Returns:
+            string: The program that was received
+
+        Errors:
+            Exception(): If the client disconnects or the program is too long
+        """
+
+        buffer = bytearray(RECV_SIZE)
+        length = 0
+        checked = 0
+
+        # Lines are checked as they arrive so that invalid programs fail before the terminator
+        stream = self.__parser.stream()
+
+        while True:
+            if len(buffer) - length < RECV_SIZE:
+                buffer.extend(bytes(len(buffer)))
+            with memoryview(buffer) as view:
+                received = self.request.recv_into(view[length:])
+            if received == 0:
+                raise Exception("client disconnected")
+
+            # The terminator may be split across reads, so the last two old bytes are searched again
+            start = max(0, length - len(END_BYTES) + 1)
+            length += received
+            if length > MAX_PROGRAM_LENGTH:
+                raise Exception("program is too long")
+            if buffer.find(END_BYTES, start, length) != -1:
+                break
+
+            line_end = buffer.rfind(b'\n', checked, length)
+            if line_end != -1:
+                with memoryview(buffer) as view:
+                    stream.feed(str(view[checked:line_end + 1], 'ascii'))
+                checked = line_end + 1
+
+        with memoryview(buffer) as view:
+            return str(view[:length], 'ascii')
+
     def handle(self):
         # http://code.activestate.com/recipes/408859/
-        self.request.settimeout(30)
+        self.request.settimeout(TIMEOUT)
         try:
-            total_data = []
-            data = ''
-
-            while True:
-                data = self.request.recv(8192)
-                data = data.decode('ascii')
-                if END in data:
-                    total_data.append(data)
-                    break
-                total_data.append(data)
-    
-            result = ''.join(total_data)
-
-            if len(result) > 1000000:
-                raise Exception()
+            result = self.receive()
 
             reply = self.__parser.parse(self.__database, result.strip())
+            # The reply is not sent until the changes made by the program are durable
+            self.__database.sync()
 
-            should_exit = False
-            parsed_elems = []
-
-            for elem in reply:
-                if elem['status'] == 'EXITING':
-                    should_exit = True
-                parsed_elems.append(str(json.dumps(elem, separators=(',', ':'))))
-
-            final_reply = '\n'.join(parsed_elems)
-            self.request.sendall(final_reply.encode('ascii') + b"\n")
+            final_reply, should_exit = format_reply(reply)
+            self.request.sendall(final_reply)
             # https://stackoverflow.com/a/36017741
             if should_exit:
                 self.server._BaseServer__shutdown_request = True
@@ -64,4 +120,171 @@ class TCPHandler(socketserver.BaseRequestHandler):
             self.request.sendall('{"status":"TIMEOUT"}\n'.encode('ascii'))
 
         except Exception:
-            self.request.sendall('{"status":"FAILED"}\n'.encode('ascii'))
\ No newline at end of file
+            self.request.sendall('{"status":"FAILED"}\n'.encode('ascii'))
+
+
+class AsyncServer:
+    """
+    This is the class for the asyncio front end of the server. Programs are read from many clients
+    concurrently, but they are executed strictly one at a time against the database by a single worker,
+    so a slow client does not block other clients while its program is still arriving.
+
+    Attributes:
+        database (Database): The database that programs are executed against.
+        parser (Parser): The parser that executes programs.
+        address ((string, int)): The host and port that the server listens on.
+        queue (asyncio.Queue): The programs waiting to be executed, with the futures for their replies.
+        executor (ThreadPoolExecutor): The single thread that programs are executed on.
+        sync_executor (ThreadPoolExecutor): The single thread that waits for programs to be durable. Programs
+            committed while the log is being synced are made durable together by the next sync.
+    """
+
+    def __init__(self, address, database, parser, max_queued=1024):
+        self.__database = database
+        self.__parser = parser
+        self.address = address
+        self.__max_queued = max_queued
+        self.__queue = None
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.__sync_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.__loop = None
+        self.__stopped = None
+        self.__started = threading.Event()
+
+    async def receive(self, reader):
+        """
+        The function to receive a program from a client up to the "***" terminator.
+
+        Parameters:
+            reader (asyncio.StreamReader): The stream the program is read from
+
+        Returns:
+            string: The program that was received
+
+        Errors:
+            asyncio.TimeoutError(): If the client does not send data within the timeout
+            Exception(): If the client disconnects or the program is too long
+        """
+
+        buffer = bytearray()
+        checked = 0
+
+        # Lines are checked as they arrive so that invalid programs fail before the terminator
+        stream = self.__parser.stream()
+
+        while True:
+            data = await asyncio.wait_for(reader.read(RECV_SIZE), TIMEOUT)
+            if not data:
+                raise Exception("client disconnected")
+
+            # The terminator may be split across reads, so the last two old bytes are searched again
+            start = max(0, len(buffer) - len(END_BYTES) + 1)
+            buffer += data
+            if len(buffer) > MAX_PROGRAM_LENGTH:
+                raise Exception("program is too long")
+            if buffer.find(END_BYTES, start) != -1:
+                break
+
+            line_end = buffer.rfind(b'\n', checked)
+            if line_end != -1:
+                stream.feed(buffer[checked:line_end + 1].decode('ascii'))
+                checked = line_end + 1
+
+        return buffer.decode('ascii')
+
+    async def execute(self, program):
+        """
+        The function to queue a program for execution and wait for its reply. The reply is returned once
+        the changes made by the program are durable, while the worker goes on to execute later programs.
+
+        Parameters:
+            program (string): The program to execute
+
+        Returns:
+            [dict]: The statuses returned by the program
+        """
+
+        future = self.__loop.create_future()
+        await self.__queue.put((program, future))
+        reply, seq = await future
+        await self.__loop.run_in_executor(self.__sync_executor, self.__database.sync, seq)
+        return reply
+
+    async def worker(self):
+        while True:
+            program, future = await self.__queue.get()
+            try:
+                reply = await self.__loop.run_in_executor(self.__executor, self.__parser.parse, self.__database, program)
+                future.set_result((reply, self.__database.last_commit()))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+
+            # No programs are executed after the database has exited
+            if any(elem['status'] == 'EXITING' for elem in reply):
+                self.stop()
+                return
+
+    async def handle(self, reader, writer):
+        try:
+            program = await self.receive(reader)
+            reply = await self.execute(program.strip())
+
+            final_reply, should_exit = format_reply(reply)
+            writer.write(final_reply)
+
+        except asyncio.TimeoutError:
+            writer.write('{"status":"TIMEOUT"}\n'.encode('ascii'))
+
+        except Exception:
+            writer.write('{"status":"FAILED"}\n'.encode('ascii'))
+
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+            except Exception:
+                pass
+
+    async def serve(self):
+        """
+        The function to accept clients until the server is stopped
+        """
+
+        self.__loop = asyncio.get_running_loop()
+        self.__queue = asyncio.Queue(self.__max_queued)
+        self.__stopped = asyncio.Event()
+
+        server = await asyncio.start_server(self.handle, self.address[0], self.address[1])
+        self.address = server.sockets[0].getsockname()[:2]
+        worker = self.__loop.create_task(self.worker())
+        self.__started.set()
+
+        async with server:
+            await self.__stopped.wait()
+            # Lets the reply to an exiting program be sent before the connections are closed
+            await asyncio.sleep(0)
+        worker.cancel()
+
+    def wait_started(self, timeout=None):
+        """
+        The function to wait until the server is accepting clients
+        """
+        return self.__started.wait(timeout)
+
+    def stop(self):
+        """
+        The function to stop the server. This can be called from any thread.
+        """
+        if self.__loop is not None:
+            self.__loop.call_soon_threadsafe(self.__stopped.set)
+
+    def receiveSignal(self, signalNumber, frame):
+        print("received SIGTERM, exiting")
+        self.stop()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.receiveSignal)
+        asyncio.run(self.serve())
+        self.__executor.shutdown()
+        self.__sync_executor.shutdown()
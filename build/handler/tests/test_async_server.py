@@ -0,0 +1,103 @@
+from handler import *
+from db.database import Database
+from db.storage import Storage
+from parser.parser import Parser
+import asyncio
+import socket
+import threading
+import time
+
+
+class example_async_server():
+
+    def __init__(self, database):
+        self.server = AsyncServer(('localhost', 0), database, Parser())
+        self.server_thread = threading.Thread(target=asyncio.run, args=(self.server.serve(),))
+        self.server_thread.start()
+        self.server.wait_started(5)
+
+    def connect(self):
+        client = socket.create_connection(self.server.address)
+        client.settimeout(5)
+        return client
+
+    def stop(self):
+        self.server.stop()
+        self.server_thread.join(5)
+
+
+class Test_AsyncServer:
+
+    def test_data_communication(self):
+        server = example_async_server(Database("admin"))
+        client = server.connect()
+        client.send(b'test***')
+        assert client.recv(1024) == b'{"status":"FAILED"}\n'
+        client.close()
+        server.stop()
+
+    def test_return(self):
+        server = example_async_server(Database("admin"))
+        client = server.connect()
+        client.send(b'as principal admin password "admin" do\nset x = "success"\n')
+        client.send(b'return x\n***')
+        assert client.recv(1024) == b'{"status":"SET"}\n{"status":"RETURNING","output":"success"}\n'
+        client.close()
+        server.stop()
+
+    def test_slow_client_does_not_block(self):
+        server = example_async_server(Database("admin"))
+
+        slow = server.connect()
+        slow.send(b'as principal admin password "admin" do\n')
+
+        fast = server.connect()
+        fast.send(b'as principal admin password "admin" do\nreturn "fast"\n***')
+        assert fast.recv(1024) == b'{"status":"RETURNING","output":"fast"}\n'
+        fast.close()
+
+        slow.send(b'return "slow"\n***')
+        assert slow.recv(1024) == b'{"status":"RETURNING","output":"slow"}\n'
+        slow.close()
+        server.stop()
+
+    def test_programs_share_database(self):
+        server = example_async_server(Database("admin"))
+
+        clients = [server.connect() for i in range(10)]
+        for i, client in enumerate(clients):
+            client.send(b'as principal admin password "admin" do\nset x%d = "value"\nreturn "done"\n***' % i)
+        for client in clients:
+            assert client.recv(1024) == b'{"status":"SET"}\n{"status":"RETURNING","output":"done"}\n'
+            client.close()
+
+        client = server.connect()
+        client.send(b'as principal admin password "admin" do\nreturn x9\n***')
+        assert client.recv(1024) == b'{"status":"RETURNING","output":"value"}\n'
+        client.close()
+        server.stop()
+
+    def test_exit(self):
+        server = example_async_server(Database("admin"))
+        client = server.connect()
+        client.send(b'as principal admin password "admin" do\nexit\n***')
+        assert client.recv(1024) == b'{"status":"EXITING"}\n'
+        client.close()
+        server.server_thread.join(5)
+        assert not server.server_thread.is_alive()
+
+    def test_reply_after_durable(self, tmp_path):
+        storage = Storage(str(tmp_path), commit_delay=0.05)
+        server = example_async_server(Database("admin", storage=storage))
+        clients = []
+        for i in range(5):
+            client = server.connect()
+            client.send(('as principal admin password "admin" do\nset x' + str(i) + ' = "value"\n***').encode('ascii'))
+            clients.append(client)
+        for client in clients:
+            assert client.recv(1024) == b'{"status":"SET"}\n'
+            assert storage.synced >= 2
+            client.close()
+        assert storage.synced == storage.seq == 6
+        server.stop()
+        storage.close()
@@ -82,6 +82,54 @@ class Test_TCPHandler:
         client.close()
         server.stop()
         
+    def test_syntax_error_before_terminator(self):
+        database = Database("admin")
+        server = socketserver.TCPServer
+        parser = Parser()
+        handler = partial(TCPHandler, database, parser, server)
+        server = example_server(handler)
+        port = server.get_port()
+        client = socket.create_connection(("localhost", port))
+        client.settimeout(5)
+        client.send(b'as principal admin password "admin" do\nset x = = "value"\n')
+        result = client.recv(1024)
+        assert result == b'{"status":"FAILED"}\n'
+        client.close()
+        server.stop()
+
+    def test_split_terminator(self):
+        database = Database("admin")
+        server = socketserver.TCPServer
+        parser = Parser()
+        handler = partial(TCPHandler, database, parser, server)
+        server = example_server(handler)
+        port = server.get_port()
+        client = socket.create_connection(("localhost", port))
+        client.settimeout(5)
+        client.send(b'as principal admin password "admin" do\nreturn "success"\n**')
+        time.sleep(0.5)
+        client.send(b'*')
+        result = client.recv(1024)
+        assert result == b'{"status":"RETURNING","output":"success"}\n'
+        client.close()
+        server.stop()
+
+    def test_client_disconnect(self):
+        database = Database("admin")
+        server = socketserver.TCPServer
+        parser = Parser()
+        handler = partial(TCPHandler, database, parser, server)
+        server = example_server(handler)
+        port = server.get_port()
+        client = socket.create_connection(("localhost", port))
+        client.settimeout(5)
+        client.send(b'as principal admin password "admin" do\n')
+        client.shutdown(socket.SHUT_WR)
+        result = client.recv(1024)
+        assert result == b'{"status":"FAILED"}\n'
+        client.close()
+        server.stop()
+
     def test_create_principal(self):
         tests = [
             {
@@ -1,9 +1,16 @@
 import sys
+import lark
 from lark import Lark, tree, Transformer
 from lark.exceptions import UnexpectedCharacters
+from lark.grammar import Rule
+from lark.lexer import TerminalDef
 from db.permissions import Right
-from db.database import Database, PrincipalKeyError, SecurityViolation
+from db.database import Database, PrincipalKeyError, SecurityViolation, ParseError
 import copy
+import hashlib
+import json
+import os
+import threading
 
 
 GRAMMAR = """
@@ -161,6 +168,75 @@ _WS: (" ")+
 
 """
 
+# Grammar for validating single lines of a program as they arrive
+
+LINE_GRAMMAR = GRAMMAR + """
+auth_line:  _WS? auth _WS?
+cmd_line:   _WS? prim_cmd _WS?
+end_line:   _WS? end_cmd _WS?
+"""
+
+LINE_STARTS = ('auth_line', 'cmd_line', 'end_line')
+
+# Commands that always modify the principals, permissions or default delegator
+GLOBAL_WRITE_CMDS = {'create_principal_call', 'change_password_call', 'set_delegation_call', 'delete_delegation_call',
+                     'default_delegator_call'}
+
+# Commands that modify a record, and which argument holds its name
+RECORD_WRITE_CMDS = {'set_call': 0, 'append_call': 0, 'foreach_call': 1, 'filtereach_call': 1}
+
+GRAMMAR_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+_parsers = {}
+_parsers_lock = threading.Lock()
+
+
+def load_parser(grammar, start='start', cache_dir=GRAMMAR_CACHE_DIR):
+    """
+    The function to return the compiled LALR parser for a grammar. Each grammar is compiled once per
+    process and shared across programs and threads. The parse tables are serialized to the cache directory
+    so that later processes load them instead of rebuilding them.
+
+    Parameters:
+        grammar (string): The grammar to compile
+        start (string | (string)): The start symbol or symbols of the grammar
+        cache_dir (string): The directory that the serialized parse tables are stored in
+
+    Returns:
+        Lark: The compiled parser for the grammar
+    """
+
+    with _parsers_lock:
+        if (grammar, start) not in _parsers:
+            _parsers[(grammar, start)] = _load_cached_parser(grammar, cache_dir, start)
+        return _parsers[(grammar, start)]
+
+
+def _load_cached_parser(grammar, cache_dir, start='start'):
+    key = hashlib.sha256((lark.__version__ + repr(start) + grammar).encode('utf-8')).hexdigest()
+    path = os.path.join(cache_dir, 'grammar-' + key[:16] + '.json')
+    namespace = {'Rule': Rule, 'TerminalDef': TerminalDef}
+
+    try:
+        with open(path) as f:
+            data, memo = json.load(f)
+        return Lark.deserialize(data, namespace, memo)
+    except Exception:
+        pass
+
+    parser = Lark(grammar, parser='lalr', start=list(start) if isinstance(start, tuple) else start)
+
+    # Failing to write the cache only costs the next process the table construction
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = path + '.' + str(os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(parser.memo_serialize([TerminalDef, Rule]), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return parser
+
 
 class T(Transformer):
 
@@ -368,8 +444,7 @@ class T(Transformer):
     
     def foreach_call(self, args):
         try:
-            parser = Lark(EACH_GRAMMAR, parser='lalr')
-            tree = parser.parse(args[2])
+            body = Compiler(self.d).compile(args[2])
 
             old_list = self.d.return_record(str(args[1]))
 
@@ -379,13 +454,11 @@ class T(Transformer):
             new_list = []
             
             for elem in old_list:
-                self.d.set_local_record(args[0], elem)
-                new_val = T(self.d).transform(tree)
+                new_val = body(str(args[0]), elem)
 
                 if isinstance(new_val, list):
                     raise Exception("failed")
                 new_list.append(new_val)            
-                self.d.delete_record(args[0]) # delete the record used for temps
 
             self.d.set_record(str(args[1]), new_list)
             self.ret.append({"status": "FOREACH"})
@@ -397,8 +470,7 @@ class T(Transformer):
 
     def filtereach_call(self, args):
         try:
-            parser = Lark(EACH_GRAMMAR, parser='lalr')
-            tree = parser.parse(args[2])
+            body = Compiler(self.d).compile(args[2])
 
             old_list = self.d.return_record(str(args[1]))
 
@@ -408,11 +480,8 @@ class T(Transformer):
             new_list = []
 
             for elem in old_list:
-                self.d.set_local_record(args[0], elem)
-                result = T(self.d).transform(tree)
-                if result == "":
+                if body(str(args[0]), elem) == "":
                     new_list.append(elem)
-                self.d.delete_record(args[0]) # delete the record used for temps
 
             self.d.set_record(str(args[1]), new_list)
             self.ret.append({"status": "FILTEREACH"})
@@ -520,14 +589,234 @@ class T(Transformer):
     def recursive_str_call(self, args):
         return "let " + args[0] + "=" + args[1] + " in " + args[2]
 
+class Compiler(Transformer):
+    """
+    This is the class that compiles the body of a foreach or filtereach into a closure. The closure
+    evaluates the body against a dictionary of bound variables instead of storing each element in the
+    database and walking the tree again. Records that are not bound are read from the database at most
+    once for the whole loop, since the body is not able to modify the database.
+
+    Attributes:
+        d (Database): The database that unbound records are read from.
+        t (T): The transformer whose functions give the semantics of the body.
+        records ({string: string | dict | list}): The records that have been read from the database.
+        exists ({string: bool}): Whether a record name is already used in the database.
+    """
+
+    def __init__(self, d):
+        self.d = d
+        self.t = T(d)
+        self.records = {}
+        self.exists = {}
+
+    def compile(self, expr_str):
+        """
+        The function to compile the body of a foreach or filtereach.
+
+        Parameters:
+            expr_str (string): The body of the foreach or filtereach
+
+        Returns:
+            function: Takes the name of the loop variable and its value and returns the value of the body
+        """
+
+        body = self.transform(load_parser(EACH_GRAMMAR).parse(expr_str))
+
+        def run(name, value):
+            env = {}
+            self.bind(env, name, value)
+            return body(env)
+        return run
+
+    def read(self, record_name):
+        if record_name not in self.records:
+            self.records[record_name] = self.d.return_record(record_name)
+        return self.records[record_name]
+
+    def bind(self, env, name, value):
+        if name not in self.exists:
+            self.exists[name] = self.d.record_exists(name)
+        if name in env or self.exists[name]:
+            raise Exception("failed")
+        env[name] = value
+
+    def call(self, func, args):
+        return lambda env: func([arg(env) for arg in args])
+
+    def val_call(self, args):
+        return args[0]
+
+    def list_call(self, args):
+        return lambda env: []
+
+    def string_call(self, args):
+        elem = self.t.string_call(args)
+        return lambda env: elem
+
+    def return_val_call(self, args):
+        name = str(args[0])
+
+        def value(env):
+            if name in env:
+                return env[name]
+            return self.read(name)
+        return value
+
+    def return_dot_call(self, args):
+        name = str(args[0])
+        field = str(args[1])
+
+        def value(env):
+            if name in env:
+                if not isinstance(env[name], dict) or field not in env[name]:
+                    raise Exception("failed")
+                return env[name][field]
+            return self.read(name + "." + field)
+        return value
+
+    def split_call(self, args):
+        return self.call(self.t.split_call, args)
+
+    def concat_call(self, args):
+        return self.call(self.t.concat_call, args)
+
+    def tolower_call(self, args):
+        return self.call(self.t.tolower_call, args)
+
+    def equal_call(self, args):
+        return self.call(self.t.equal_call, args)
+
+    def notequal_call(self, args):
+        return self.call(self.t.notequal_call, args)
+
+    def field_base_call(self, args):
+        key = args[0]
+        value = args[1]
+        return lambda env: self.t.field_base_call([key, value(env)])
+
+    def field_recur_call(self, args):
+        return self.call(self.t.field_recur_call, args)
+
+    def recursive_start_call(self, args):
+        return (str(args[0]), args[1])
+
+    def recursive_call(self, args):
+        name, start = args[0]
+        end = args[1]
+
+        def value(env):
+            self.bind(env, name, start(env))
+            result = end(env)
+            del env[name]
+            return result
+        return value
+
+
+class ProgramStream:
+    """
+    This is the class that checks the syntax of a program line by line as it arrives, so that a program
+    with a syntax error can be rejected before the "***" terminator is received. Lines are only rejected
+    when they cannot appear at their position in any valid program; the complete program is still parsed
+    by Parser.parse.
+
+    Attributes:
+        parser (Lark): The parser for single lines of a program.
+        buffer (string): The part of the current line that has not been terminated yet.
+        state (string): The kind of line that is expected next ("auth", "cmd" or "end").
+    """
+
+    def __init__(self):
+        self.parser = load_parser(LINE_GRAMMAR, LINE_STARTS)
+        self.buffer = ''
+        self.state = 'auth'
+
+    def feed(self, data):
+        """
+        The function to check the lines of a program that have been completed by the given data.
+
+        Parameters:
+            data (string): The next part of the program
+
+        Errors:
+            ParseError(): If a line of the program can not be valid
+        """
+
+        lines = (self.buffer + data).split('\n')
+        self.buffer = lines.pop()
+        for line in lines:
+            self.check_line(line)
+
+    def check_line(self, line):
+        # Blank lines and comments are left for the full parse to decide
+        if line.strip() == '' or line.lstrip().startswith('//'):
+            return
+
+        if self.state == 'end':
+            raise ParseError("program continues after return or exit")
+
+        try:
+            if self.state == 'auth':
+                self.parser.parse(line, start='auth_line')
+                self.state = 'cmd'
+            else:
+                try:
+                    self.parser.parse(line, start='cmd_line')
+                except Exception:
+                    self.parser.parse(line, start='end_line')
+                    self.state = 'end'
+
+        except Exception:
+            raise ParseError("line can not appear in a valid program")
+
+
 class Parser:
     def __init__(self):
-        self.parser = Lark(GRAMMAR, parser='lalr')
+        self.parser = load_parser(GRAMMAR)
+        load_parser(EACH_GRAMMAR)
+        load_parser(LINE_GRAMMAR, LINE_STARTS)
+
+    def stream(self):
+        """
+        The function to start checking a new program as it arrives.
+
+        Returns:
+            ProgramStream: The stream that the program is fed to
+        """
+        return ProgramStream()
+
+    def is_read_only(self, tree):
+        """
+        The function to check whether a parsed program is unable to modify the global store, principals
+        or permissions. Records that are written are only allowed if the program declared them as local.
+
+        Parameters:
+            tree (Tree): The parsed program
+
+        Returns:
+            bool: Whether the program is read only
+        """
+
+        local_records = set()
+        for cmd in tree.children:
+            if not isinstance(cmd, tree.__class__) or cmd.data != 'cmd':
+                continue
+            prim_cmd = cmd.children[0]
+            if prim_cmd.data in GLOBAL_WRITE_CMDS:
+                return False
+            elif prim_cmd.data == 'local_call':
+                local_records.add(str(prim_cmd.children[0]))
+            elif prim_cmd.data in RECORD_WRITE_CMDS:
+                if str(prim_cmd.children[RECORD_WRITE_CMDS[prim_cmd.data]]) not in local_records:
+                    return False
+        return True
 
     def parse(self, database, text):
         try:
-            database.create_backups()
             tree = self.parser.parse(text)
+
+            # Read only programs can not change anything that would need to be rolled back
+            if not self.is_read_only(tree):
+                database.create_backups()
             t = T(database)
             t.transform(tree)
             database.reset(rollback=False)
@@ -0,0 +1,33 @@
+from parser.parser import Parser, GRAMMAR, EACH_GRAMMAR, LINE_GRAMMAR, LINE_STARTS, load_parser, _load_cached_parser
+import os
+
+
+class Test_Grammar_Cache:
+
+    def test_parser_shared(self):
+        assert load_parser(GRAMMAR) is load_parser(GRAMMAR)
+        assert load_parser(EACH_GRAMMAR) is load_parser(EACH_GRAMMAR)
+        assert Parser().parser is Parser().parser
+        assert load_parser(LINE_GRAMMAR, LINE_STARTS) is load_parser(LINE_GRAMMAR, LINE_STARTS)
+
+    def test_cache_written(self, tmp_path):
+        _load_cached_parser(EACH_GRAMMAR, str(tmp_path))
+
+        assert len([f for f in os.listdir(str(tmp_path)) if f.startswith("grammar-")]) == 1
+
+    def test_cached_parser_matches(self, tmp_path):
+        text = 'as principal admin password "admin" do\nset x = { f1 = "a", f2 = y }\nreturn x.f1\n***'
+
+        built = _load_cached_parser(GRAMMAR, str(tmp_path))
+        loaded = _load_cached_parser(GRAMMAR, str(tmp_path))
+
+        assert built is not loaded
+        assert built.parse(text) == loaded.parse(text)
+
+    def test_unwritable_cache(self, tmp_path):
+        cache_dir = tmp_path / "cache"
+        cache_dir.write_text("not a directory")
+
+        parser = _load_cached_parser(EACH_GRAMMAR, str(cache_dir))
+
+        assert parser.parse('concat(x, "a")') is not None
@@ -78,4 +78,53 @@ class Test_Basic_Parse:
 
         d = Database("admin")
 
-        validate_tests(d, tests)
\ No newline at end of file
+        validate_tests(d, tests)
+
+class Test_Read_Only:
+
+    def test_classify_programs(self):
+        p = Parser()
+
+        read_only = [
+            'as principal admin password "admin" do\nreturn x\n***',
+            'as principal admin password "admin" do\nlocal y = x\nreturn let z = "a" in concat(z, y)\n***',
+            'as principal admin password "admin" do\nlocal y = []\nappend to y with x\nset y = x\nforeach e in y replacewith e\nexit\n***',
+        ]
+        writes = [
+            'as principal admin password "admin" do\nset x = "a"\nreturn x\n***',
+            'as principal admin password "admin" do\nappend to x with "a"\nlocal x = []\nreturn x\n***',
+            'as principal admin password "admin" do\nfiltereach e in x with e\nreturn x\n***',
+            'as principal admin password "admin" do\ncreate principal bob "password"\nreturn "a"\n***',
+            'as principal admin password "admin" do\nset delegation x admin read -> bob\nreturn "a"\n***',
+            'as principal admin password "admin" do\ndefault delegator = bob\nreturn "a"\n***',
+        ]
+
+        for text in read_only:
+            assert p.is_read_only(p.parser.parse(text))
+        for text in writes:
+            assert not p.is_read_only(p.parser.parse(text))
+
+    def test_read_only_program_failure(self):
+        d = Database("admin")
+
+        text1 = 'as principal admin password "admin" do\nset x = "a"\nreturn x\n***'
+        text2 = 'as principal admin password "admin" do\nlocal y = []\nappend to y with x\nreturn z\n***'
+        text3 = 'as principal admin password "admin" do\nlocal y = []\nreturn y\n***'
+
+        tests = [
+            {
+                "text": text1,
+                "exp_status": ["SET", "RETURNING"],
+                "output": "a"
+            },
+            {
+                "text": text2,
+                "exp_status": ["FAILED"]
+            },
+            {
+                "text": text3,
+                "exp_status": ["LOCAL", "RETURNING"],
+                "output": []
+            }
+        ]
+        validate_tests(d, tests)
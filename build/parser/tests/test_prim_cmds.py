@@ -617,6 +617,47 @@ class Test_For_Each():
         d = Database("admin")
         validate_tests(d, tests)
 
+    def test_foreach_records(self):
+        text1 = 'as principal admin password "admin" do\ncreate principal bob "password"\nset x = []\nappend to x with "one"\nappend to x with "two"\nset y = "suffix"\nset z = []\nappend to z with "three"\nset delegation z admin write -> bob\nset delegation z admin read -> bob\nreturn "exiting"\n***'
+        text2 = 'as principal admin password "admin" do\nforeach elem in x replacewith concat(elem, y)\nreturn x\n***'
+        text3 = 'as principal admin password "admin" do\nforeach y in x replacewith y\nreturn x\n***' # loop variable already exists
+        text4 = 'as principal admin password "admin" do\nforeach elem in x replacewith let elem = "a" in elem\nreturn x\n***' # let shadows the loop variable
+        text5 = 'as principal bob password "password" do\nforeach elem in z replacewith concat(elem, y)\nreturn z\n***' # no read permission on y
+        text6 = 'as principal bob password "password" do\nset z = []\nforeach elem in z replacewith concat(elem, y)\nreturn z\n***' # y is never read
+
+        tests = [
+            {
+                "text": text1,
+                "exp_status": ["CREATE_PRINCIPAL", "SET", "APPEND", "APPEND", "SET", "SET", "APPEND", "SET_DELEGATION", "SET_DELEGATION", "RETURNING"],
+                "output": "exiting"
+            },
+            {
+                "text": text2,
+                "exp_status": ["FOREACH", "RETURNING"],
+                "output": ["onesuffix", "twosuffix"]
+            },
+            {
+                "text": text3,
+                "exp_status": ["FAILED"]
+            },
+            {
+                "text": text4,
+                "exp_status": ["FAILED"]
+            },
+            {
+                "text": text5,
+                "exp_status": ["DENIED"]
+            },
+            {
+                "text": text6,
+                "exp_status": ["SET", "FOREACH", "RETURNING"],
+                "output": []
+            }
+        ]
+
+        d = Database("admin")
+        validate_tests(d, tests)
+
 
 class Test_Delegation:
 
@@ -0,0 +1,33 @@
+from parser.parser import Parser, ParseError
+import pytest
+
+
+class Test_Program_Stream:
+
+    def test_valid_program(self):
+        s = Parser().stream()
+        s.feed('as principal admin password "admin" do // comment\n')
+        s.feed('set x = "value"\n// full line comment\n  local y = { f1 = x }\n')
+        s.feed('ret')
+        s.feed('urn y.f1\n')
+
+    def test_invalid_auth(self):
+        s = Parser().stream()
+        with pytest.raises(ParseError):
+            s.feed('as principal admin do\n')
+
+    def test_invalid_cmd(self):
+        s = Parser().stream()
+        s.feed('as principal admin password "admin" do\n')
+        with pytest.raises(ParseError):
+            s.feed('set x = = "value"\n')
+
+    def test_cmd_after_return(self):
+        s = Parser().stream()
+        s.feed('as principal admin password "admin" do\nexit\n')
+        with pytest.raises(ParseError):
+            s.feed('set x = "value"\n')
+
+    def test_partial_line_not_checked(self):
+        s = Parser().stream()
+        s.feed('as principal admin password "admin" do\nset x = ')